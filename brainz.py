@@ -94,6 +94,10 @@ class FLACArtistFetcher:
         return [name for name in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, name))]
 
 
+class MusicBrainzLookupError(Exception):
+    """Raised when a MusicBrainz lookup fails after all retries."""
+
+
 class MusicBrainzClient:
     API_URL = "https://musicbrainz.org/ws/2/artist/"
     SEARCH_URL = "https://musicbrainz.org/ws/2/artist/"
@@ -102,8 +106,9 @@ class MusicBrainzClient:
     INITIAL_BACKOFF = 4
     BACKOFF_MULTIPLIER = 2
     
-    def __init__(self):
+    def __init__(self, raise_on_failure=False):
         self.session = requests.Session()
+        self.raise_on_failure = raise_on_failure  # Raise instead of returning empty results when lookups fail
     
     def search_artist(self, artist_name):
         """Search for an artist using MusicBrainz API."""
@@ -132,6 +137,8 @@ class MusicBrainzClient:
                 time.sleep(backoff)
                 backoff *= self.BACKOFF_MULTIPLIER
                 retries += 1
+        if self.raise_on_failure:
+            raise MusicBrainzLookupError(f"MusicBrainz search for '{normalized_name}' failed after {retries} attempts")
         return None, [], []
     
     def _find_best_match(self, artist_name, artist_list):
@@ -153,6 +160,8 @@ class MusicBrainzClient:
             return [tag["name"] for tag in result.get("artist", {}).get("tag-list", [])]
         except Exception as e:
             logging.error(f"Error fetching genres: {e}")
+            if self.raise_on_failure:
+                raise
             return []
     
     def get_related_artists(self, artist_id):
@@ -162,6 +171,8 @@ class MusicBrainzClient:
             return [rel["artist"]["name"] for rel in result.get("artist", {}).get("artist-relation-list", [])]
         except Exception as e:
             logging.error(Fore.RED + f"Error fetching related artists: {e}" + Style.RESET_ALL)
+            if self.raise_on_failure:
+                raise
             return []
 
 
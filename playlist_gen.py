@@ -95,8 +95,8 @@ class ArtistProcessor:
 
 
 class PlaylistManager:
-    def __init__(self):
-        self.playlist_manager = SpotifyPlaylistManager()
+    def __init__(self, spotify_manager=None):
+        self.playlist_manager = spotify_manager if spotify_manager else SpotifyPlaylistManager()
 
     def create_playlist(self, playlist_name, track_ids):
         """Shuffle tracks and create a playlist."""
@@ -105,9 +105,36 @@ class PlaylistManager:
 
 
 class MusicService:
-    def __init__(self):
-        self.musicbrainz_client = MusicBrainzClient()
-        self.artist_fetcher = FLACArtistFetcher(FLAC_DIRECTORY, related_fetcher=self.musicbrainz_client)
+    def __init__(self, flac_directory=FLAC_DIRECTORY, musicbrainz_client=None):
+        self.musicbrainz_client = musicbrainz_client if musicbrainz_client else MusicBrainzClient()
+        self.artist_fetcher = FLACArtistFetcher(flac_directory, related_fetcher=self.musicbrainz_client)
+
+    def resolve_artist(self, artist_name, alternate_names):
+        """Look up related artists and genres for one artist, trying each alternate name."""
+        logging.info(f"Processing artist: {artist_name}")
+
+        # Try each alternate name for searching
+        related_artists = []
+        genres = []
+        for alt_name in alternate_names:
+            artist_id, related_artists_temp, genres_temp = self.musicbrainz_client.search_artist(alt_name)
+            if related_artists_temp:
+                related_artists = related_artists_temp
+                genres = genres_temp
+                break
+
+        # Log related artists and genres
+        if related_artists:
+            logging.info(Fore.CYAN + f"Related artists for {artist_name}: {', '.join(related_artists)}" + Style.RESET_ALL)
+        else:
+            logging.info(Fore.YELLOW + f"No related artists found for {artist_name}" + Style.RESET_ALL)
+
+        if genres:
+            logging.info(Fore.LIGHTGREEN_EX + f"Genres for {artist_name}: {', '.join(genres)}" + Style.RESET_ALL)
+        else:
+            logging.info(Fore.YELLOW + f"No genres found for {artist_name}" + Style.RESET_ALL)
+
+        return related_artists, genres
 
     def process_artists(self, artist_processor):
         """Process artists and fetch related artists and genres."""
@@ -123,74 +150,56 @@ class MusicService:
 
         # Process artists and fetch related data
         for artist_name, alternate_names in alternate_names_dict.items():
-            logging.info(f"Processing artist: {artist_name}")
             time.sleep(0.2)  # Rate limiting adjustment
-
-            # Try each alternate name for searching
-            related_artists = []
-            genres = []
-            for alt_name in alternate_names:
-                artist_id, related_artists_temp, genres_temp = self.musicbrainz_client.search_artist(alt_name)
-                if related_artists_temp:
-                    related_artists = related_artists_temp
-                    genres = genres_temp
-                    break
-            
-            # Log related artists and genres
-            if related_artists:
-                logging.info(Fore.CYAN + f"Related artists for {artist_name}: {', '.join(related_artists)}" + Style.RESET_ALL)
-            else:
-                logging.info(Fore.YELLOW + f"No related artists found for {artist_name}" + Style.RESET_ALL)
-
-            if genres:
-                logging.info(Fore.LIGHTGREEN_EX + f"Genres for {artist_name}: {', '.join(genres)}" + Style.RESET_ALL)
-            else:
-                logging.info(Fore.YELLOW + f"No genres found for {artist_name}" + Style.RESET_ALL)
-
-            # Store genres in dictionary
-            genre_key = tuple(genres) if genres else ("No genres found",)
-            if genre_key not in genre_dict:
-                genre_dict[genre_key] = set()
-            if related_artists:
-                genre_dict[genre_key].update(related_artists)
+            related_artists, genres = self.resolve_artist(artist_name, alternate_names)
+            add_to_genre_dict(genre_dict, genres, related_artists)
 
         return genre_dict
 
 
-def main():
-    artist_processor = ArtistProcessor(FLAC_DIRECTORY)
-    playlist_manager = PlaylistManager()
-    music_service = MusicService()
+def add_to_genre_dict(genre_dict, genres, related_artists):
+    """Store an artist's related artists under its genre key."""
+    genre_key = tuple(genres) if genres else ("No genres found",)
+    if genre_key not in genre_dict:
+        genre_dict[genre_key] = set()
+    if related_artists:
+        genre_dict[genre_key].update(related_artists)
+
+
+def fetch_artist_tracks(spotify_manager, artist_names):
+    """Fetch top tracks for each artist, returning one list of track IDs per artist found."""
+    track_lists = []
+    for related in artist_names:
+        time.sleep(0.2)  # Rate limiting adjustment
+        rel_id = spotify_manager.fetch_spotify_artist_id(related)
+        if rel_id:
+            track_lists.append(spotify_manager.fetch_top_tracks(rel_id))
+    return track_lists
+
+
+def batch_tracks(track_lists, batch_size=100):
+    """Group per-artist track lists into batches without splitting an artist across batches."""
+    track_batches = []
+    current_batch = []
+    for track_ids in track_lists:
+        if len(current_batch) + len(track_ids) > batch_size:
+            track_batches.append(current_batch)
+            current_batch = []
+        current_batch.extend(track_ids)
+
+    if current_batch:
+        track_batches.append(current_batch)
+    return track_batches
 
-    genre_dict = music_service.process_artists(artist_processor)
 
+def create_genre_playlists(playlist_manager, genre_tracks):
+    """Create numbered playlists for each genre from its per-artist track lists."""
     # Dictionary to keep track of the number of playlists created for each genre
     genre_playlist_count = {}
     unknown_genre_count = 1  # Counter for unknown genre playlists
 
-    # Create playlists for genres and artists
-    for genre, artists in genre_dict.items():
-        all_new_artists = list(set(artists))  # Remove duplicates
-
-        # Shuffle the artists within the genre
-        random.shuffle(all_new_artists)
-
-        track_batches = []
-        current_batch = []
-
-        # Fetch and process tracks in bulk
-        for related in all_new_artists:
-            time.sleep(0.2)  # Rate limiting adjustment
-            rel_id = playlist_manager.playlist_manager.fetch_spotify_artist_id(related)
-            if rel_id:
-                track_ids = playlist_manager.playlist_manager.fetch_top_tracks(rel_id)
-                if len(current_batch) + len(track_ids) > 100:
-                    track_batches.append(current_batch)
-                    current_batch = []
-                current_batch.extend(track_ids)
-        
-        if current_batch:
-            track_batches.append(current_batch)
+    for genre, track_lists in genre_tracks.items():
+        track_batches = batch_tracks(track_lists)
 
         # Sort the genres alphabetically before creating playlists, and handle unknown genres
         if genre == "Unknown Genre":
@@ -214,5 +223,25 @@ def main():
             playlist_manager.create_playlist(playlist_name, batch)
 
 
+def main():
+    artist_processor = ArtistProcessor(FLAC_DIRECTORY)
+    playlist_manager = PlaylistManager()
+    music_service = MusicService()
+
+    genre_dict = music_service.process_artists(artist_processor)
+
+    # Fetch tracks for genres and artists
+    genre_tracks = {}
+    for genre, artists in genre_dict.items():
+        all_new_artists = list(set(artists))  # Remove duplicates
+
+        # Shuffle the artists within the genre
+        random.shuffle(all_new_artists)
+
+        genre_tracks[genre] = fetch_artist_tracks(playlist_manager.playlist_manager, all_new_artists)
+
+    create_genre_playlists(playlist_manager, genre_tracks)
+
+
 if __name__ == "__main__":
     main()
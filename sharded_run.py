@@ -0,0 +1,242 @@
+import sys
+import time
+import json
+import random
+import sqlite3
+import logging
+import argparse
+import multiprocessing
+import musicbrainzngs
+from colorama import Fore, Style
+from brainz import MusicBrainzClient, MusicBrainzLookupError
+from spotify_client import SpotifyPlaylistManager, SpotifyLookupError
+from playlist_gen import (
+    FLAC_DIRECTORY, ArtistProcessor, MusicService, PlaylistManager,
+    add_to_genre_dict, create_genre_playlists
+)
+
+
+DEFAULT_STORE = "shard_results.db"
+
+
+def load_shard_configs(config_path):
+    """Load the list of per-worker credential sets from a JSON file."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    shards = config.get("shards", [])
+    if not shards:
+        raise ValueError(f"No shards defined in {config_path}")
+    for index, shard in enumerate(shards):
+        for key in ("client_id", "client_secret", "musicbrainz_contact"):
+            if not shard.get(key):
+                raise ValueError(f"Shard {index} in {config_path} is missing '{key}'")
+    return config.get("flac_directory", FLAC_DIRECTORY), shards
+
+
+def partition_artists(artist_names, shard_count):
+    """Split artist names round-robin into one list per shard."""
+    ordered = sorted(artist_names)
+    return [ordered[i::shard_count] for i in range(shard_count)]
+
+
+def open_store(store_path):
+    """Open the shared results store, creating its tables if needed."""
+    conn = sqlite3.connect(store_path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")  # Let several workers write concurrently
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS artists ("
+        "artist TEXT PRIMARY KEY, shard INTEGER, genres TEXT, related_artists TEXT)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS related_tracks ("
+        "artist TEXT PRIMARY KEY, track_ids TEXT)"
+    )
+    conn.commit()
+    return conn
+
+
+def configure_musicbrainz(shard):
+    """Apply a shard's MusicBrainz user agent, host and rate limit to this process."""
+    musicbrainzngs.set_useragent("PlaylistGenerator", "1.0", shard["musicbrainz_contact"])
+    if shard.get("musicbrainz_host"):
+        musicbrainzngs.set_hostname(shard["musicbrainz_host"], use_https=shard.get("musicbrainz_https", False))
+    interval = shard.get("musicbrainz_interval")
+    if interval is not None:
+        if interval > 0:
+            musicbrainzngs.set_rate_limit(interval, 1)
+        else:
+            musicbrainzngs.set_rate_limit(False)  # No throttling, e.g. for a local stand-in server
+
+
+def create_spotify_manager(shard, shard_index):
+    """Create a Spotify client for a shard, with its own token cache."""
+    return SpotifyPlaylistManager(
+        client_id=shard["client_id"],
+        client_secret=shard["client_secret"],
+        redirect_uri=shard.get("redirect_uri", "http://localhost:8888/callback"),
+        cache_path=shard.get("cache_path", f".cache-shard{shard_index}"),
+        api_prefix=shard.get("spotify_api_prefix"),
+        accounts_url=shard.get("spotify_accounts_url"),
+        request_delay=shard.get("spotify_delay", 0.3),
+        raise_on_failure=True
+    )
+
+
+def authorize_shards(shards):
+    """Authorize each shard's Spotify app in turn so workers start from a cached token.
+
+    The OAuth browser flow binds a local server on the redirect port, so it must
+    not run in several worker processes at once.
+    """
+    for shard_index, shard in enumerate(shards):
+        logging.info(Fore.LIGHTBLUE_EX + f"[Shard {shard_index}] Authorizing Spotify app" + Style.RESET_ALL)
+        if not create_spotify_manager(shard, shard_index).authenticated:
+            logging.error(Fore.RED + f"[Shard {shard_index}] Spotify authentication failed; no workers were started." + Style.RESET_ALL)
+            return False
+    return True
+
+
+def run_shard(shard_index, shard, flac_directory, artist_names, store_path):
+    """Resolve one shard of artists and write the results to the shared store.
+
+    An artist is only stored once all of its lookups succeed, so artists whose
+    lookups failed are retried on the next run. Returns False if the shard could
+    not authenticate with Spotify or any artist failed.
+    """
+    logging.info(Fore.LIGHTBLUE_EX + f"[Shard {shard_index}] Processing {len(artist_names)} artists" + Style.RESET_ALL)
+    artist_processor = ArtistProcessor(flac_directory)
+    music_service = MusicService(flac_directory, MusicBrainzClient(raise_on_failure=True))
+    configure_musicbrainz(shard)  # After MusicService, which sets its own user agent
+    spotify_manager = create_spotify_manager(shard, shard_index)
+    if not spotify_manager.authenticated:
+        logging.error(Fore.RED + f"[Shard {shard_index}] Spotify authentication failed; skipping shard" + Style.RESET_ALL)
+        return False
+    conn = open_store(store_path)
+    failed_artists = []
+
+    try:
+        for artist_name in artist_names:
+            if artist_name == "Unknown Artist":
+                continue
+            if conn.execute("SELECT 1 FROM artists WHERE artist = ?", (artist_name,)).fetchone():
+                continue  # Already resolved by an earlier run
+
+            time.sleep(shard.get("artist_delay", 0.2))  # Rate limiting adjustment, as in process_artists
+            try:
+                alternate_names = artist_processor.normalize_artist_name(artist_name)
+                related_artists, genres = music_service.resolve_artist(artist_name, alternate_names)
+
+                for related in related_artists:
+                    if conn.execute("SELECT 1 FROM related_tracks WHERE artist = ?", (related,)).fetchone():
+                        continue  # Another shard already fetched this artist's tracks
+                    rel_id = spotify_manager.fetch_spotify_artist_id(related)
+                    track_ids = spotify_manager.fetch_top_tracks(rel_id) if rel_id else []
+                    conn.execute(
+                        "INSERT OR REPLACE INTO related_tracks (artist, track_ids) VALUES (?, ?)",
+                        (related, json.dumps(track_ids))
+                    )
+                    conn.commit()
+            except (MusicBrainzLookupError, SpotifyLookupError) as e:
+                logging.error(Fore.RED + f"[Shard {shard_index}] Leaving {artist_name} for the next run: {e}" + Style.RESET_ALL)
+                failed_artists.append(artist_name)
+                continue
+
+            conn.execute(
+                "INSERT OR REPLACE INTO artists (artist, shard, genres, related_artists) VALUES (?, ?, ?, ?)",
+                (artist_name, shard_index, json.dumps(genres), json.dumps(related_artists))
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+    if failed_artists:
+        logging.error(Fore.RED + f"[Shard {shard_index}] {len(failed_artists)} artists failed and will be retried on the next run" + Style.RESET_ALL)
+        return False
+    logging.info(Fore.GREEN + f"[Shard {shard_index}] Finished" + Style.RESET_ALL)
+    return True
+
+
+def shard_worker(*args):
+    """Process entry point: run a shard and exit non-zero if it did not complete."""
+    if not run_shard(*args):
+        sys.exit(1)
+
+
+def merge_results(store_path, playlist_manager):
+    """Assemble playlists from every shard's results in the shared store."""
+    conn = open_store(store_path)
+    try:
+        genre_dict = {}
+        for genres, related_artists in conn.execute("SELECT genres, related_artists FROM artists ORDER BY artist"):
+            add_to_genre_dict(genre_dict, json.loads(genres), json.loads(related_artists))
+        related_tracks = {
+            artist: json.loads(track_ids)
+            for artist, track_ids in conn.execute("SELECT artist, track_ids FROM related_tracks")
+        }
+    finally:
+        conn.close()
+
+    genre_tracks = {}
+    for genre, artists in genre_dict.items():
+        all_new_artists = list(set(artists))  # Remove duplicates
+
+        # Shuffle the artists within the genre
+        random.shuffle(all_new_artists)
+
+        genre_tracks[genre] = [related_tracks[artist] for artist in all_new_artists if related_tracks.get(artist)]
+
+    create_genre_playlists(playlist_manager, genre_tracks)
+
+
+def run_sharded(config_path, store_path=DEFAULT_STORE, merge=True):
+    """Resolve the library across one worker process per shard, then merge into playlists."""
+    flac_directory, shards = load_shard_configs(config_path)
+    artist_names = MusicService(flac_directory).artist_fetcher.fetch_artists()
+    partitions = partition_artists(artist_names, len(shards))
+
+    if not authorize_shards(shards):
+        return False
+    open_store(store_path).close()  # Create the tables before the workers race to do so
+
+    processes = []
+    for shard_index, (shard, shard_artists) in enumerate(zip(shards, partitions)):
+        process = multiprocessing.Process(
+            target=shard_worker,
+            args=(shard_index, shard, flac_directory, shard_artists, store_path),
+            name=f"shard-{shard_index}"
+        )
+        process.start()
+        processes.append(process)
+
+    failed = []
+    for process in processes:
+        process.join()
+        if process.exitcode != 0:
+            failed.append(process.name)
+
+    if failed:
+        logging.error(Fore.RED + f"Shards failed: {', '.join(failed)}. Re-run to resume them before merging." + Style.RESET_ALL)
+        return False
+
+    if merge:
+        spotify_manager = create_spotify_manager(shards[0], 0)
+        if not spotify_manager.authenticated:
+            logging.error(Fore.RED + "Spotify authentication failed; playlists were not created." + Style.RESET_ALL)
+            return False
+        merge_results(store_path, PlaylistManager(spotify_manager))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create Spotify playlists using several API credential sets in parallel.")
+    parser.add_argument("config", help="JSON file listing one credential set per shard")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="SQLite file shared by the workers")
+    parser.add_argument("--no-merge", action="store_true", help="Only resolve artists; skip creating playlists")
+    args = parser.parse_args()
+
+    if not run_sharded(args.config, args.store, merge=not args.no_merge):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
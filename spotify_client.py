@@ -7,6 +7,7 @@ import random
 import requests
 import spotipy
 from spotipy import SpotifyOAuth
+from spotipy.oauth2 import CacheFileHandler
 import musicbrainzngs
 from fuzzywuzzy import process, fuzz
 from colorama import Fore, init, Style
@@ -20,21 +21,39 @@ def log_error(message):
         f.write(message + "\n")
 
 
+class SpotifyLookupError(Exception):
+    """Raised when a Spotify lookup fails after all retries."""
+
+
 class SpotifyPlaylistManager:
-    def __init__(self):
+    def __init__(self, client_id="YOUR_CLIENT_ID", client_secret="YOUR_CLIENT_SECRET",
+                 redirect_uri="http://localhost:8888/callback", cache_path=None,
+                 api_prefix=None, accounts_url=None, request_delay=0.3, raise_on_failure=False):
         logging.info(Fore.YELLOW + "Initializing Spotify Authentication..." + Style.RESET_ALL)
+        self.request_delay = request_delay  # Minimum gap between Spotify API requests
+        self.authenticated = False  # Set once current_user() succeeds
+        self.raise_on_failure = raise_on_failure  # Raise instead of returning empty results when lookups fail
 
         try:
-            self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-                client_id="YOUR_CLIENT_ID",
-                client_secret="YOUR_CLIENT_SECRET",
-                redirect_uri="http://localhost:8888/callback",
-                scope="playlist-modify-public playlist-modify-private user-library-read"
-            ))
+            auth_manager = SpotifyOAuth(
+                client_id=client_id,
+                client_secret=client_secret,
+                redirect_uri=redirect_uri,
+                scope="playlist-modify-public playlist-modify-private user-library-read",
+                cache_handler=CacheFileHandler(cache_path=cache_path)
+            )
+            if accounts_url:
+                # Point the authorize and token endpoints at a different accounts host (e.g. a local stand-in)
+                auth_manager.OAUTH_AUTHORIZE_URL = accounts_url.rstrip("/") + "/authorize"
+                auth_manager.OAUTH_TOKEN_URL = accounts_url.rstrip("/") + "/api/token"
+            self.sp = spotipy.Spotify(auth_manager=auth_manager)
+            if api_prefix:
+                self.sp.prefix = api_prefix  # Point at a different Web API host (e.g. a local stand-in)
             logging.info(Fore.GREEN + "Spotify Authentication Successful!" + Style.RESET_ALL)
 
             # Verify that authentication works
             current_user = self.sp.current_user()
+            self.authenticated = True
             logging.info(Fore.LIGHTBLUE_EX + f"Logged in as: {current_user['display_name']}" + Style.RESET_ALL)
 
         except Exception as e:
@@ -50,7 +69,7 @@ class SpotifyPlaylistManager:
             try:
                 logging.debug(f"Calling Spotify API for: {artist_name}")  # Removed 🎵 emoji
 
-                time.sleep(0.3)  # Ensure requests are at least 0.3 seconds apart
+                time.sleep(self.request_delay)  # Ensure requests are at least request_delay seconds apart
                 results = self.sp.search(q=artist_name, type='artist', limit=1)
 
                 if results['artists']['items']:
@@ -66,11 +85,14 @@ class SpotifyPlaylistManager:
                 time.sleep(6 * (2 ** (retries - 1)))  # Exponential backoff
 
         logging.error(Fore.RED + f"Failed to retrieve Spotify artist ID for '{artist_name}' after {retries} attempts." + Style.RESET_ALL)
+        if self.raise_on_failure:
+            raise SpotifyLookupError(f"Spotify search for '{artist_name}' failed after {retries} attempts")
         return None
 
     def fetch_top_tracks(self, artist_id, country="UK"):
         """Fetch top tracks for the given artist from Spotify."""
         try:
+            time.sleep(self.request_delay)  # Keep top track requests within the same rate budget as searches
             # Use the artist's Spotify ID to fetch top tracks
             tracks = self.sp.artist_top_tracks(artist_id, country=country)
             track_ids = [track['id'] for track in tracks['tracks']]
@@ -78,6 +100,8 @@ class SpotifyPlaylistManager:
             return track_ids
         except Exception as e:
             logging.error(f"Error fetching top tracks for artist {artist_id}: {e}")
+            if self.raise_on_failure:
+                raise SpotifyLookupError(f"Fetching top tracks for artist {artist_id} failed") from e
             return []
 
     def create_playlist(self, playlist_name, track_ids):
@@ -0,0 +1,240 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+import pytest
+
+import sharded_run
+from brainz import MusicBrainzClient
+from playlist_gen import PlaylistManager
+
+
+SCOPE = "playlist-modify-public playlist-modify-private user-library-read"
+
+# Library artist -> (MusicBrainz ID, tags, related artists)
+MUSICBRAINZ_ARTISTS = {
+    "Alpha": ("00000000-0000-0000-0000-000000000001", ["rock"], ["Delta", "Epsilon"]),
+    "Beta": ("00000000-0000-0000-0000-000000000002", ["rock"], ["Delta"]),
+    "Gamma": ("00000000-0000-0000-0000-000000000003", ["jazz"], ["Zeta"]),
+}
+
+# Related artist -> (Spotify ID, top track IDs); Epsilon is not on Spotify
+SPOTIFY_ARTISTS = {
+    "Delta": ("Delta00000000000000000", ["t1", "t2"]),
+    "Zeta": ("Zeta000000000000000000", ["t3"]),
+}
+
+MB_NS = 'xmlns="http://musicbrainz.org/ns/mmd-2.0#" xmlns:ext="http://musicbrainz.org/ns/ext#-2.0"'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves just enough of the Spotify, Spotify accounts and MusicBrainz APIs."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, payload, status=200):
+        self._send(status, json.dumps(payload))
+
+    def _send_xml(self, body):
+        self._send(200, f'<?xml version="1.0" encoding="UTF-8"?><metadata {MB_NS}>{body}</metadata>', "application/xml")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith("/ws/2/artist"):
+            self._musicbrainz(url.path, query)
+        elif url.path.startswith("/v1/"):
+            self._spotify_get(url.path, query)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        state = self.server.state
+        if url.path == "/api/token":
+            state["token_refreshes"] += 1
+            self._send_json({"access_token": "refreshed", "token_type": "Bearer", "expires_in": 3600, "scope": SCOPE})
+        elif not self._authorized():
+            self._send_json({"error": {"status": 401, "message": "Invalid access token"}}, 401)
+        elif url.path == "/v1/users/tester/playlists":
+            playlist_id = f"pl{len(state['playlists']) + 1}"
+            state["playlists"][playlist_id] = {"name": json.loads(body)["name"], "tracks": []}
+            self._send_json({"id": playlist_id}, 201)
+        elif url.path.startswith("/v1/playlists/") and url.path.endswith("/tracks"):
+            playlist_id = url.path.split("/")[3]
+            state["playlists"][playlist_id]["tracks"].extend(uri.split(":")[-1] for uri in json.loads(body))
+            self._send_json({"snapshot_id": "snapshot"}, 201)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _authorized(self):
+        return self.headers.get("Authorization") in ("Bearer valid", "Bearer refreshed")
+
+    def _musicbrainz(self, path, query):
+        state = self.server.state
+        if path.rstrip("/") == "/ws/2/artist":
+            name = query["query"][0]
+            if name.lower() in state["failing"]:
+                self._send(400, "Bad request", "text/plain")
+                return
+            matches = [(artist, info[0]) for artist, info in MUSICBRAINZ_ARTISTS.items() if artist.lower() == name.lower()]
+            artists = "".join(
+                f'<artist id="{mbid}" type="Group" ext:score="100"><name>{escape(artist)}</name></artist>'
+                for artist, mbid in matches
+            )
+            self._send_xml(f'<artist-list count="{len(matches)}" offset="0">{artists}</artist-list>')
+            return
+
+        mbid = path.rsplit("/", 1)[-1]
+        artist, (_, tags, related) = next((a, info) for a, info in MUSICBRAINZ_ARTISTS.items() if info[0] == mbid)
+        includes = query.get("inc", [""])[0].split("+")
+        extra = ""
+        if "tags" in includes:
+            extra += "<tag-list>" + "".join(f'<tag count="1"><name>{tag}</name></tag>' for tag in tags) + "</tag-list>"
+        if "artist-rels" in includes:
+            relations = "".join(
+                f'<relation type="member of band"><target>{index:036d}</target>'
+                f'<artist id="{index:036d}"><name>{escape(name)}</name></artist></relation>'
+                for index, name in enumerate(related, start=100)
+            )
+            extra += f'<relation-list target-type="artist">{relations}</relation-list>'
+        self._send_xml(f'<artist id="{mbid}" type="Group"><name>{escape(artist)}</name>{extra}</artist>')
+
+    def _spotify_get(self, path, query):
+        path = path.rstrip("/")
+        if not self._authorized():
+            self._send_json({"error": {"status": 401, "message": "Invalid access token"}}, 401)
+        elif path == "/v1/me":
+            self._send_json({"id": "tester", "display_name": "Tester"})
+        elif path == "/v1/search":
+            artist = SPOTIFY_ARTISTS.get(query["q"][0])
+            items = [{"id": artist[0], "name": query["q"][0]}] if artist else []
+            self._send_json({"artists": {"items": items}})
+        elif path.startswith("/v1/artists/") and path.endswith("/top-tracks"):
+            spotify_id = path.split("/")[3]
+            tracks = next(tracks for sid, tracks in SPOTIFY_ARTISTS.values() if sid == spotify_id)
+            self._send_json({"tracks": [{"id": track} for track in tracks]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+
+@pytest.fixture
+def stand_in_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.state = {"failing": set(), "playlists": {}, "token_refreshes": 0}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def flac_directory(tmp_path):
+    library = tmp_path / "flac"
+    for artist in MUSICBRAINZ_ARTISTS:
+        (library / artist).mkdir(parents=True)
+    return str(library)
+
+
+@pytest.fixture(autouse=True)
+def no_musicbrainz_backoff(monkeypatch):
+    monkeypatch.setattr(MusicBrainzClient, "INITIAL_BACKOFF", 0)
+
+
+def make_shard(server, tmp_path, index, access_token="valid", expires_in=3600):
+    """Build a shard config pointing at the stand-in server, with a pre-seeded token cache."""
+    host = f"127.0.0.1:{server.server_address[1]}"
+    cache_path = str(tmp_path / f".cache-shard{index}")
+    with open(cache_path, "w") as f:
+        json.dump({
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "scope": SCOPE,
+            "expires_at": int(time.time()) + expires_in,
+            "refresh_token": "refresh",
+        }, f)
+    return {
+        "client_id": f"client-{index}",
+        "client_secret": f"secret-{index}",
+        "musicbrainz_contact": f"shard{index}@example.com",
+        "cache_path": cache_path,
+        "spotify_api_prefix": f"http://{host}/v1/",
+        "spotify_accounts_url": f"http://{host}",
+        "musicbrainz_host": host,
+        "musicbrainz_interval": 0,
+        "spotify_delay": 0,
+        "artist_delay": 0,
+    }
+
+
+def stored_artists(store_path):
+    conn = sqlite3.connect(store_path)
+    try:
+        return {row[0] for row in conn.execute("SELECT artist FROM artists")}
+    finally:
+        conn.close()
+
+
+def created_playlists(server):
+    return sorted((playlist["name"], sorted(playlist["tracks"])) for playlist in server.state["playlists"].values())
+
+
+def test_failed_artists_are_retried_on_next_run(stand_in_server, flac_directory, tmp_path):
+    store_path = str(tmp_path / "results.db")
+    shards = [make_shard(stand_in_server, tmp_path, index) for index in range(2)]
+    partitions = sharded_run.partition_artists(os.listdir(flac_directory), len(shards))
+
+    stand_in_server.state["failing"].add("gamma")
+    results = [
+        sharded_run.run_shard(index, shard, flac_directory, partition, store_path)
+        for index, (shard, partition) in enumerate(zip(shards, partitions))
+    ]
+    assert results == [False, True]  # Alpha and Gamma land in shard 0
+    assert stored_artists(store_path) == {"Alpha", "Beta"}
+
+    stand_in_server.state["failing"].clear()
+    assert sharded_run.run_shard(0, shards[0], flac_directory, partitions[0], store_path)
+    assert stored_artists(store_path) == {"Alpha", "Beta", "Gamma"}
+
+    spotify_manager = sharded_run.create_spotify_manager(shards[0], 0)
+    sharded_run.merge_results(store_path, PlaylistManager(spotify_manager))
+    assert created_playlists(stand_in_server) == [("jazz 1", ["t3"]), ("rock 1", ["t1", "t2"])]
+
+
+def test_unauthenticated_shard_fails_without_storing(stand_in_server, flac_directory, tmp_path):
+    store_path = str(tmp_path / "results.db")
+    shard = make_shard(stand_in_server, tmp_path, 0, access_token="revoked")
+
+    assert not sharded_run.run_shard(0, shard, flac_directory, ["Alpha"], store_path)
+    assert not os.path.exists(store_path)
+
+
+def test_run_sharded_uses_worker_processes(stand_in_server, flac_directory, tmp_path):
+    store_path = str(tmp_path / "results.db")
+    # Shard 1 starts with an expired token, refreshed through the stand-in accounts endpoint
+    shards = [make_shard(stand_in_server, tmp_path, 0), make_shard(stand_in_server, tmp_path, 1, expires_in=-60)]
+    config_path = tmp_path / "shards.json"
+    config_path.write_text(json.dumps({"flac_directory": flac_directory, "shards": shards}))
+
+    assert sharded_run.run_sharded(str(config_path), store_path)
+    assert stored_artists(store_path) == {"Alpha", "Beta", "Gamma"}
+    assert stand_in_server.state["token_refreshes"] == 1
+    assert created_playlists(stand_in_server) == [("jazz 1", ["t3"]), ("rock 1", ["t1", "t2"])]